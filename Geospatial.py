@@ -1,60 +1,88 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from haversine import haversine
-import plotly.express as px
+import plotly.graph_objects as go
+from data import get_dataset, get_data_version
 
-# Load and preprocess data
-@st.cache_data
-def load_data():
-    df = pd.read_csv('/Users/todankar/Desktop/traffic management/Bangalore_1Day_NETC.csv')
-    
-    # Extract coordinates
-    df[['latitude', 'longitude']] = df['geocode'].str.split(',', expand=True).astype(float)
-    
-    # Parse datetime with error handling
-    df['initiated_time'] = pd.to_datetime(df['initiated_time'], errors='coerce')
-    df['hour'] = df['initiated_time'].dt.hour.fillna(-1).astype(int)
-    
-    return df
+EARTH_RADIUS_KM = 6371.0088
+CONGESTION_COLORS = {'Low': 'green', 'Medium': 'yellow', 'High': 'red'}
 
-def calculate_congestion(df):
+@st.cache_data
+def calculate_congestion(_hourly_stats, data_version):
     """Calculate real-time congestion metrics with empty data handling"""
     try:
-        congestion = df.groupby(['merchant_name', 'hour']).agg(
-            total_traffic=('tag_id', 'count'),
-            avg_processing_time=('inn_rr_time_sec', 'mean'),
-            lanes_open=('lane', 'nunique')
-        ).reset_index()
+        congestion = _hourly_stats.rename(columns={'vehicle_count': 'total_traffic'})
         
         congestion['congestion_level'] = np.where(
             congestion['total_traffic'] > 50, 
             'High', 
             np.where(congestion['total_traffic'] > 25, 'Medium', 'Low')
         )
-        return congestion
+        # Hour index lets main() pull the selected hour with a single .loc
+        return congestion.set_index('hour').sort_index(kind='stable')
     except Exception as e:
         st.error(f"Error calculating congestion: {str(e)}")
         return pd.DataFrame()
 
+# Map layout shared by every traffic map; only the traces change per rerun
+@st.cache_resource
+def _map_template():
+    fig = go.Figure()
+    fig.update_layout(mapbox_style="open-street-map", mapbox_zoom=10,
+                      legend_title_text="congestion_level",
+                      margin=dict(l=0, r=0, t=0, b=0))
+    return fig
+
+# Rebuilt only when the hour or the dataset changes
+@st.cache_resource
+def build_traffic_map(_plazas, _current_hour_data, current_hour, data_version):
+    map_df = _plazas.merge(_current_hour_data, on='merchant_name')
+    
+    # Copy of the template with one marker trace per congestion level
+    fig = go.Figure(_map_template())
+    sizeref = map_df['total_traffic'].max() / 20 ** 2
+    for level in map_df['congestion_level'].unique():
+        level_df = map_df[map_df['congestion_level'] == level]
+        fig.add_trace(go.Scattermapbox(
+            lat=level_df['latitude'],
+            lon=level_df['longitude'],
+            mode='markers',
+            name=level,
+            hovertext=level_df['merchant_name'],
+            hovertemplate=f"<b>%{{hovertext}}</b><br><br>congestion_level={level}"
+                          "<br>total_traffic=%{marker.size}<br>latitude=%{lat}"
+                          "<br>longitude=%{lon}<extra></extra>",
+            marker=dict(size=level_df['total_traffic'], sizemode='area',
+                        sizeref=sizeref, color=CONGESTION_COLORS[level])
+        ))
+    
+    fig.update_layout(mapbox_center=dict(lat=map_df['latitude'].mean(),
+                                         lon=map_df['longitude'].mean()))
+    return fig
+
 def main():
     st.set_page_config(page_title="Geospatial Toll Routing", layout="wide")
     st.title("Bangalore Toll Plaza Traffic Management System")
     
-    df = load_data()
-    congestion_df = calculate_congestion(df)
+    data_version = get_data_version()
+    ds = get_dataset(data_version)
+    df, plazas, tree = ds.df, ds.plazas, ds.tree
+    plaza_coords = plazas.set_index('merchant_name')
+    congestion_df = calculate_congestion(ds.hourly_stats, data_version)
     
     if df.empty or congestion_df.empty:
         st.error("No data available - please check your data source")
         return
 
+    current_hour = pd.Timestamp.now().hour
+    current_hour_data = congestion_df.loc[current_hour:current_hour]
+    
     # Real-time Traffic Overview
     st.header("Real-time Toll Plaza Status")
-    current_hour = pd.Timestamp.now().hour
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        selected_plaza = st.selectbox("Select Toll Plaza", df['merchant_name'].unique())
+        selected_plaza = st.selectbox("Select Toll Plaza", plazas['merchant_name'].values)
     
     with col2:
         radius = st.slider("Search Radius (km)", 1, 10, 5)
@@ -64,21 +92,17 @@ def main():
     
     try:
         # Get plaza coordinates with error handling
-        plaza_data = df[df['merchant_name'] == selected_plaza][['latitude', 'longitude']].iloc[0]
+        plaza_data = plaza_coords.loc[selected_plaza]
         current_location = (plaza_data['latitude'], plaza_data['longitude'])
-    except IndexError:
+    except KeyError:
         st.error("Selected plaza coordinates not found")
         return
     
     # Find nearby plazas with distance calculation
     try:
-        df['distance'] = df.apply(lambda row: 
-            haversine(current_location, (row['latitude'], row['longitude'])), axis=1)
-        
-        nearby_plazas = df[
-            (df['distance'] <= radius) & 
-            (df['merchant_name'] != selected_plaza)
-        ]['merchant_name'].unique()
+        idx = tree.query_radius(np.radians([current_location]), r=radius / EARTH_RADIUS_KM)[0]
+        nearby = plazas['merchant_name'].iloc[idx]
+        nearby_plazas = nearby[nearby != selected_plaza].unique()
     except Exception as e:
         st.error(f"Error calculating distances: {str(e)}")
         nearby_plazas = []
@@ -89,9 +113,8 @@ def main():
     
     with col1:
         try:
-            current_status = congestion_df[
-                (congestion_df['merchant_name'] == selected_plaza) &
-                (congestion_df['hour'] == current_hour)
+            current_status = current_hour_data[
+                current_hour_data['merchant_name'] == selected_plaza
             ].iloc[0]
             
             st.metric("Current Plaza Traffic", 
@@ -104,10 +127,9 @@ def main():
 
     with col2:
         try:
-            alt_plazas = congestion_df[
-                (congestion_df['merchant_name'].isin(nearby_plazas)) &
-                (congestion_df['hour'] == current_hour) &
-                (congestion_df['congestion_level'] == 'Low')
+            alt_plazas = current_hour_data[
+                (current_hour_data['merchant_name'].isin(nearby_plazas)) &
+                (current_hour_data['congestion_level'] == 'Low')
             ]
             
             if not alt_plazas.empty:
@@ -122,22 +144,8 @@ def main():
     # Geospatial Visualization with error handling
     st.header("Live Traffic Map")
     try:
-        map_df = df[['merchant_name', 'latitude', 'longitude']].drop_duplicates()
-        current_hour_data = congestion_df[congestion_df['hour'] == current_hour]
-        
         if not current_hour_data.empty:
-            map_df = map_df.merge(current_hour_data, on='merchant_name')
-            
-            fig = px.scatter_mapbox(map_df,
-                                  lat="latitude",
-                                  lon="longitude",
-                                  color="congestion_level",
-                                  size="total_traffic",
-                                  hover_name="merchant_name",
-                                  zoom=10,
-                                  color_discrete_map={'Low':'green', 'Medium':'yellow', 'High':'red'})
-            
-            fig.update_layout(mapbox_style="open-street-map")
+            fig = build_traffic_map(plazas, current_hour_data, current_hour, data_version)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No traffic data available for current hour")
@@ -152,15 +160,14 @@ def main():
                                     alt_plazas['merchant_name'].unique())
             
             try:
-                dest_coords = df[df['merchant_name'] == destination][
-                    ['latitude', 'longitude']].iloc[0]
+                dest_coords = plaza_coords.loc[destination]
                 
                 maps_link = f"""https://www.google.com/maps/dir/?api=1&origin={
                     current_location[0]},{current_location[1]}&destination={
                     dest_coords['latitude']},{dest_coords['longitude']}&travelmode=driving"""
                 
                 st.markdown(f"[Get Alternative Route via {destination}]({maps_link})")
-            except IndexError:
+            except KeyError:
                 st.warning("Selected destination coordinates not found")
         else:
             st.info("No alternative routes available - all nearby plazas congested")
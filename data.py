@@ -0,0 +1,108 @@
+import os
+import tempfile
+from types import SimpleNamespace
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+from sklearn.neighbors import BallTree
+
+DATA_PATH = '/Users/todankar/Desktop/traffic management/Bangalore_1Day_NETC.csv'
+# Bump the version whenever read_csv_data() changes so stale copies aren't reused
+PARQUET_PATH = DATA_PATH.replace('.csv', '.v1.parquet')
+COLUMNS = [
+    'initiated_time', 'merchant_name', 'geocode', 'tag_id',
+    'inn_rr_time_sec', 'lane', 'direction', 'vehicle_class_code'
+]
+
+# Parse and preprocess the raw CSV
+def read_csv_data():
+    df = pd.read_csv(
+        DATA_PATH,
+        engine='pyarrow',
+        usecols=COLUMNS,
+        dtype={
+            'geocode': 'string[pyarrow]',
+            'merchant_name': 'category',
+            'vehicle_class_code': 'category',
+            'direction': 'category',
+            'lane': 'category',
+            'tag_id': 'string[pyarrow]'
+        }
+    )
+    
+    # Fix datetime parsing - rows without a valid date fall back to their time part
+    parsed = pd.to_datetime(df['initiated_time'], format='%d-%m-%Y %H:%M', errors='coerce')
+    time_part = df['initiated_time'].str.split().str[-1]
+    fallback = pd.to_datetime('01-01-2024 ' + time_part, format='%d-%m-%Y %H:%M', errors='coerce')
+    df['initiated_time'] = parsed.fillna(fallback)
+    df = df.dropna(subset=['initiated_time'])
+    df['hour'] = df['initiated_time'].dt.hour
+    
+    # Extract coordinates
+    coords = df['geocode'].str.split(',', n=1, expand=True)
+    df['latitude'] = pd.to_numeric(coords[0], errors='coerce').astype(float)
+    df['longitude'] = pd.to_numeric(coords[1], errors='coerce').astype(float)
+    df = df.drop(columns='geocode')
+    
+    return df
+
+def write_parquet_cache(df):
+    # Write to a temp file next to the cache and swap it in, so readers never
+    # see a half-written copy
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(PARQUET_PATH))
+        os.close(fd)
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, PARQUET_PATH)
+    except OSError:
+        # Data folder not writable or full - parse the CSV next time too
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def get_data_version():
+    # CSV modification time, used to key caches built from the dataset
+    return os.path.getmtime(DATA_PATH)
+
+# Shared by all pages so the CSV is parsed and indexed once. cache_resource
+# hands every rerun the same read-only objects instead of an unpickled copy;
+# nothing is written to disk besides the Parquet copy
+@st.cache_resource
+def get_dataset(data_version):
+    # Reuse the preprocessed Parquet copy unless the CSV is newer
+    df = None
+    if os.path.exists(PARQUET_PATH) and os.path.getmtime(PARQUET_PATH) >= data_version:
+        try:
+            df = pd.read_parquet(PARQUET_PATH, engine='pyarrow')
+            df['tag_id'] = df['tag_id'].astype('string[pyarrow]')  # Parquet reads it back as string[python]
+        except (pa.ArrowInvalid, OSError):
+            df = None  # Truncated or unreadable copy - rebuild it below
+    if df is None:
+        df = read_csv_data()
+        write_parquet_cache(df)
+    
+    # One row per plaza so lookups don't rescan the full dataset
+    plazas = df.groupby('merchant_name', as_index=False, sort=False, observed=True)[
+        ['latitude', 'longitude']].first().dropna(subset=['latitude', 'longitude'])
+    plazas = plazas.reset_index(drop=True)
+    
+    # Spatial index over plaza locations for radius queries
+    tree = BallTree(np.radians(plazas[['latitude', 'longitude']].to_numpy()), metric='haversine')
+    
+    # Index by plaza and hour so per-plaza/per-hour lookups avoid full scans
+    df = df.set_index(['merchant_name', 'hour']).sort_index()
+    
+    # Plaza x hour x direction vehicle counts, sliced per interaction
+    traffic_cube = df.groupby(
+        ['merchant_name', 'hour', 'direction'], observed=True).size().unstack(fill_value=0)
+    
+    # Plaza x hour traffic stats; each page derives its own congestion levels
+    hourly_stats = df.groupby(level=['merchant_name', 'hour'], observed=True).agg(
+        vehicle_count=('tag_id', 'size'),
+        avg_processing_time=('inn_rr_time_sec', 'mean'),
+        lanes_open=('lane', 'nunique')
+    ).reset_index()
+    
+    return SimpleNamespace(df=df, plazas=plazas, tree=tree, traffic_cube=traffic_cube,
+                           hourly_stats=hourly_stats)
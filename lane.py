@@ -1,28 +1,7 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from datetime import time, timedelta
-
-# Load dataset from CSV with proper datetime handling
-@st.cache_data
-def load_traffic_data():
-    df = pd.read_csv('/Users/todankar/Desktop/traffic management/Bangalore_1Day_NETC.csv')
-    
-    # Fix datetime parsing
-    def parse_datetime(x):
-        try:
-            return pd.to_datetime(x, format='%d-%m-%Y %H:%M')
-        except:
-            time_part = x.split()[-1]
-            return pd.to_datetime(f'01-01-2024 {time_part}', format='%d-%m-%Y %H:%M')
-    
-    df['initiated_time'] = df['initiated_time'].apply(parse_datetime)
-    
-    # Clean and preprocess data
-    df[['latitude', 'longitude']] = df['geocode'].str.split(',', expand=True).astype(float)
-    df['hour'] = df['initiated_time'].dt.hour
-    df['minute'] = df['initiated_time'].dt.minute
-    return df
+from data import get_dataset, get_data_version
 
 def calculate_lane_allocation(north, south, total_lanes=8):
     total = north + south
@@ -37,12 +16,35 @@ def calculate_lane_allocation(north, south, total_lanes=8):
     
     return north_lanes, south_lanes
 
+# Plotly figures are cached per plaza/hour; the frames themselves aren't hashed
+@st.cache_resource
+def build_vehicle_class_pie(_df, selected_plaza, selected_hour, data_version):
+    vehicle_counts = _df.loc[(selected_plaza, selected_hour),
+                             'vehicle_class_code'].value_counts().reset_index()
+    vehicle_counts = vehicle_counts[vehicle_counts['count'] > 0]
+    return px.pie(vehicle_counts, names='vehicle_class_code', 
+                  values='count', hole=0.4)
+
+@st.cache_resource
+def build_traffic_trend(_traffic_cube, selected_plaza, selected_hour, data_version):
+    hourly_trend = _traffic_cube.loc[selected_plaza].reset_index()
+    fig_line = px.line(hourly_trend, x='hour', y=['N', 'S'], 
+                      title="24-hour Traffic Trend",
+                      labels={'value': 'Vehicles', 'hour': 'Hour of Day'})
+    
+    # Add vertical line for selected time
+    fig_line.add_vline(x=selected_hour, line_dash="dash", 
+                      line_color="red", annotation_text="Selected Time")
+    return fig_line
+
 def main():
     st.set_page_config(page_title="Bangalore Toll Lane Manager", layout="wide")
     st.title("Dynamic Lane Allocation - Bangalore Toll Plazas")
     
     # Load data
-    df = load_traffic_data()
+    data_version = get_data_version()
+    ds = get_dataset(data_version)
+    df, traffic_cube = ds.df, ds.traffic_cube
     
     # Time slot selection
     col1, col2 = st.columns(2)
@@ -60,8 +62,7 @@ def main():
     selected_hour = selected_time.hour
     
     # Get counts for selected hour
-    hourly_counts = df[df['hour'] == selected_hour].groupby(
-        ['merchant_name', 'direction']).size().unstack(fill_value=0)
+    hourly_counts = traffic_cube.xs(selected_hour, level='hour')
     
     # Plaza selection
     plazas = hourly_counts.index.tolist()
@@ -81,11 +82,7 @@ def main():
         
         # Vehicle class distribution
         st.subheader("Vehicle Class Distribution")
-        vehicle_counts = df[(df['merchant_name'] == selected_plaza) & 
-                          (df['hour'] == selected_hour)][
-                            'vehicle_class_code'].value_counts().reset_index()
-        fig_pie = px.pie(vehicle_counts, names='vehicle_class_code', 
-                        values='count', hole=0.4)
+        fig_pie = build_vehicle_class_pie(df, selected_plaza, selected_hour, data_version)
         st.plotly_chart(fig_pie, use_container_width=True)
         
     # Calculate lane allocation
@@ -108,15 +105,7 @@ def main():
     
     # Time-series analysis
     st.subheader(f"Daily Traffic Pattern ({selected_time.strftime('%H:%M')} highlighted)")
-    hourly_trend = df[df['merchant_name'] == selected_plaza].groupby(
-        ['hour', 'direction']).size().unstack().reset_index()
-    fig_line = px.line(hourly_trend, x='hour', y=['N', 'S'], 
-                      title="24-hour Traffic Trend",
-                      labels={'value': 'Vehicles', 'hour': 'Hour of Day'})
-    
-    # Add vertical line for selected time
-    fig_line.add_vline(x=selected_hour, line_dash="dash", 
-                      line_color="red", annotation_text="Selected Time")
+    fig_line = build_traffic_trend(traffic_cube, selected_plaza, selected_hour, data_version)
     st.plotly_chart(fig_line, use_container_width=True)
 
 if __name__ == "__main__":
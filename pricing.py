@@ -2,87 +2,117 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
+from data import get_dataset, get_data_version
 
-# Load and preprocess data
-@st.cache_data
-def load_data():
-    df = pd.read_csv('/Users/todankar/Desktop/traffic management/Bangalore_1Day_NETC.csv')
-    
-    # Extract time from invalid dates
-    df['initiated_time'] = pd.to_datetime(df['initiated_time'], errors='coerce').dt.time
-    df['hour'] = pd.to_datetime(df['initiated_time'], format='%H:%M').dt.hour
-    
-    # Vehicle class base pricing
-    base_prices = {
-        'VC4': 50, 'VC5': 60, 'VC7': 75, 'VC9': 90,
-        'VC10': 110, 'VC11': 130, 'VC12': 150, 'VC13': 170, 'VC20': 200
-    }
-    df['base_price'] = df['vehicle_class_code'].map(base_prices).fillna(50)
-    
-    return df
+# Vehicle class base pricing
+BASE_PRICES = {
+    'VC4': 50, 'VC5': 60, 'VC7': 75, 'VC9': 90,
+    'VC10': 110, 'VC11': 130, 'VC12': 150, 'VC13': 170, 'VC20': 200
+}
 
-def calculate_congestion(df):
-    # Calculate traffic density per hour per plaza
-    congestion = df.groupby(['merchant_name', 'hour']).agg(
-        traffic_count=('tag_id', 'count'),
-        avg_speed=('inn_rr_time_sec', lambda x: np.mean(x) if not x.empty else 0)
-    ).reset_index()
+# Keyed on data_version (the CSV's mtime); _hourly_stats is skipped by the cache hasher
+@st.cache_data
+def calculate_congestion(_hourly_stats, data_version):
+    # Traffic density per hour per plaza
+    congestion = _hourly_stats.rename(columns={
+        'vehicle_count': 'traffic_count', 'avg_processing_time': 'avg_speed'
+    })[['merchant_name', 'hour', 'traffic_count', 'avg_speed']]
+    congestion['avg_speed'] = congestion['avg_speed'].fillna(0)
     
     # Handle edge cases before binning
     congestion = congestion.dropna(subset=['traffic_count'])
     
-    # Modified qcut with error handling
-    try:
-        congestion['traffic_level'] = pd.qcut(congestion['traffic_count'], 
-                                            q=5, 
-                                            labels=[1, 2, 3, 4, 5],
-                                            duplicates='drop')  # Key fix
-    except ValueError as e:
-        st.error(f"Quantile binning failed: {str(e)}")
+    # Quintile traffic levels 1-5 (right-closed bins, as pd.qcut);
+    # duplicate edges are merged so skewed counts just yield fewer levels
+    counts = congestion['traffic_count'].to_numpy()
+    if counts.size:
+        edges = np.unique(np.quantile(counts, np.linspace(0, 1, 6)))[1:-1]
+        congestion['traffic_level'] = np.searchsorted(edges, counts, side='left') + 1
+    else:
         congestion['traffic_level'] = 3  # Fallback value
     
-    return congestion
+    # Sorted by hour so the pricing grid rows come out in hour order
+    return congestion.set_index('hour').sort_index(kind='stable')
 
-def dynamic_pricing(row, surge_multiplier):
-    # Pricing logic based on traffic levels
-    if row['traffic_level'] == 5:
-        return 0  # Free during peak congestion
-    elif row['traffic_level'] >= 3:
-        return row['base_price'] * surge_multiplier
-    else:
-        return row['base_price']
+@st.cache_data
+def calculate_base_prices(_df, data_version):
+    # Vehicle classes seen at each plaza, with their base price
+    base_prices = _df.groupby(
+        ['merchant_name', 'vehicle_class_code'], observed=True).size().reset_index()
+    base_prices['base_price'] = base_prices['vehicle_class_code'].map(
+        BASE_PRICES).astype(float).fillna(50)
+    return base_prices[['merchant_name', 'vehicle_class_code', 'base_price']]
+
+@st.cache_data
+def calculate_pricing(_congestion_df, _base_prices, selected_plaza, surge_multiplier, data_version):
+    # Hourly traffic levels (H,) and vehicle class base prices (V,) for one plaza
+    plaza_congestion = _congestion_df[_congestion_df['merchant_name'] == selected_plaza]
+    plaza_classes = _base_prices[_base_prices['merchant_name'] == selected_plaza]
+    level = plaza_congestion['traffic_level'].astype(int).to_numpy()[:, None]
+    base = plaza_classes['base_price'].to_numpy()[None, :]
+    
+    # Apply dynamic pricing over the (H, V) grid - free at peak (level 5), surge at levels 3-4
+    price = np.where(level == 5, 0.0, np.where(level >= 3, base * surge_multiplier, base))
+    
+    # Long format, one row per hour and vehicle class
+    n_hours, n_classes = price.shape
+    return pd.DataFrame({
+        'hour': np.repeat(plaza_congestion.index.to_numpy(), n_classes),
+        'vehicle_class_code': np.tile(plaza_classes['vehicle_class_code'].to_numpy(), n_hours),
+        'traffic_level': np.repeat(level[:, 0], n_classes),
+        'dynamic_price': price.ravel()
+    })
+
+@st.cache_data
+def pricing_matrix(_pricing_df, selected_plaza, surge_multiplier, data_version):
+    # Vehicle class x hour price table for one plaza
+    return (_pricing_df
+            .groupby(['vehicle_class_code', 'hour'], observed=True)['dynamic_price'].mean()
+            .unstack('hour', fill_value=0)
+            .astype(np.int32))
+
+# Traffic-level heatmap and price trend for one plaza; the trend depends on surge
+@st.cache_resource
+def build_pricing_charts(_pricing_df, selected_plaza, surge_multiplier, data_version):
+    # Heatmap for traffic levels
+    fig1 = px.density_heatmap(
+        _pricing_df,
+        x='hour', y='vehicle_class_code', z='traffic_level',
+        nbinsx=24, color_continuous_scale='Viridis',
+        title="Traffic Level Heatmap (1=Low, 5=High)"
+    )
+    
+    # Line chart for pricing
+    fig2 = px.line(
+        _pricing_df,
+        x='hour', y='dynamic_price', color='vehicle_class_code',
+        markers=True, title="Dynamic Pricing Trend"
+    )
+    return fig1, fig2
 
 def main():
     st.set_page_config(page_title="Dynamic Toll Pricing", layout="wide")
     st.title("Bangalore Toll Plaza Dynamic Pricing System")
     
-    df = load_data()
-    congestion_df = calculate_congestion(df)
+    data_version = get_data_version()
+    ds = get_dataset(data_version)
+    df = ds.df
+    congestion_df = calculate_congestion(ds.hourly_stats, data_version)
+    current_hour = pd.Timestamp.now().hour
+    current_hour_data = congestion_df.loc[current_hour:current_hour]
     
     # User Controls
     col1, col2 = st.columns(2)
     with col1:
         surge_multiplier = st.slider("Surge Multiplier (Levels 3-4)", 1.2, 3.0, 1.8, 0.1)
     with col2:
-        selected_plaza = st.selectbox("Select Toll Plaza", df['merchant_name'].unique())
+        selected_plaza = st.selectbox("Select Toll Plaza", sorted(congestion_df['merchant_name'].unique()))
     
-    # Merge base prices with congestion data
-    pricing_df = congestion_df.merge(
-        df[['merchant_name', 'vehicle_class_code', 'base_price']].drop_duplicates(),
-        on='merchant_name'
-    )
-    
-    # Apply dynamic pricing
-    pricing_df['dynamic_price'] = pricing_df.apply(
-        lambda row: dynamic_pricing(row, surge_multiplier), axis=1
-    )
+    base_prices = calculate_base_prices(df, data_version)
+    pricing_df = calculate_pricing(congestion_df, base_prices, selected_plaza, surge_multiplier, data_version)
     
     # Current Hour Analysis
-    current_hour = pd.Timestamp.now().hour
-    current_data = pricing_df[
-        (pricing_df['merchant_name'] == selected_plaza) & 
-        (pricing_df['hour'] == current_hour)
-    ]
+    current_data = current_hour_data[current_hour_data['merchant_name'] == selected_plaza]
     
     st.header(f"Real-time Pricing - {selected_plaza}")
     
@@ -98,20 +128,7 @@ def main():
     # Visualization
     st.subheader("24-Hour Pricing Schedule")
     
-    # Heatmap for traffic levels
-    fig1 = px.density_heatmap(
-        pricing_df[pricing_df['merchant_name'] == selected_plaza],
-        x='hour', y='vehicle_class_code', z='traffic_level',
-        nbinsx=24, color_continuous_scale='Viridis',
-        title="Traffic Level Heatmap (1=Low, 5=High)"
-    )
-    
-    # Line chart for pricing
-    fig2 = px.line(
-        pricing_df[pricing_df['merchant_name'] == selected_plaza],
-        x='hour', y='dynamic_price', color='vehicle_class_code',
-        markers=True, title="Dynamic Pricing Trend"
-    )
+    fig1, fig2 = build_pricing_charts(pricing_df, selected_plaza, surge_multiplier, data_version)
     
     col1, col2 = st.columns(2)
     with col1:
@@ -121,10 +138,7 @@ def main():
     
     # Pricing Table
     st.subheader("Detailed Pricing Matrix")
-    pivot_df = pricing_df[pricing_df['merchant_name'] == selected_plaza].pivot_table(
-        index='vehicle_class_code', columns='hour', 
-        values='dynamic_price', aggfunc='mean'
-    ).fillna(0).astype(int)
+    pivot_df = pricing_matrix(pricing_df, selected_plaza, surge_multiplier, data_version)
     
     st.dataframe(
         pivot_df.style.format("{:.0f}").background_gradient(cmap='YlOrRd'),